@@ -1,24 +1,28 @@
 # app.py — TPD Draft Generator (industry-aware + roll-forward vs rewrite + DOCX formatting + .DOC conversion)
 from __future__ import annotations
-import io, re, json, os, subprocess, tempfile
-from typing import Dict, Any, List, Optional, Tuple
+import io, re, json, os, subprocess, tempfile, html, atexit, functools, importlib, copy, zipfile, shutil, socket, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import chain, islice
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Callable, Dict, Any, Iterator, List, Mapping, Optional, Tuple
 
 import streamlit as st
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-
-# Optional deps
-try:
-    import pdfplumber
-except Exception:
-    pdfplumber = None
-
-try:
-    from docx import Document as DocxDocument
+
+if TYPE_CHECKING:
+    import docx.document
+    import pandas as pd
     from docx.text.paragraph import Paragraph
-except Exception:
-    DocxDocument = None  # guarded below
+
+# Heavy / optional deps are imported on first use (see _lazy) so pages that don't
+# need them — and every Streamlit cold start — skip their import cost
+@functools.lru_cache(maxsize=None)
+def _lazy(module: str):
+    """Import a module on first use (cached); None if it is not installed."""
+    try:
+        return importlib.import_module(module)
+    except Exception:
+        return None
 
 st.set_page_config(page_title="TPD Draft Generator", layout="wide")
 st.sidebar.title("TPA (Transfer Pricing Associate)")
@@ -32,30 +36,174 @@ page = st.sidebar.radio(
 # ==========================
 # Helpers: PDF / DOCX text
 # ==========================
-def read_pdf(file_like) -> str:
-    if pdfplumber is None:
+PDF_DETECT_MAX_PAGES = 60  # industry detection only needs the front of a prior TPD
+DOCX_DETECT_MAX_CHARS = 200_000  # same idea for DOCX: roughly the first 60 pages of text
+
+def _pdf_page_text(page) -> str:
+    # One malformed page should not sink the whole document
+    try:
+        return page.extract_text() or ""
+    except Exception:
         return ""
+    finally:
+        # Drop the page's cached layout objects once its text is out, so a long
+        # PDF doesn't keep every page's char/word objects alive until the end
+        try:
+            page.flush_cache()
+        except Exception:
+            pass
+
+def iter_pdf_pages(file_like) -> Iterator[str]:
+    """Yield page texts in order, one page at a time, so callers can stream or stop early."""
+    fitz = _lazy("fitz")  # PyMuPDF: C-backed, much faster for plain text extraction
+    if fitz is not None:
+        pos = file_like.tell()
+        try:
+            pdf = fitz.open(stream=file_like.read(), filetype="pdf")
+        except Exception:
+            pdf = None
+            file_like.seek(pos)  # fall back to pdfplumber below
+        if pdf is not None:
+            with pdf:
+                for page in pdf:
+                    try:
+                        yield page.get_text("text")
+                    except Exception:
+                        yield ""
+            return
+    pdfplumber = _lazy("pdfplumber")
+    if pdfplumber is None:
+        return
+    # Sequential on purpose: pages share one pdfminer document and file stream, which
+    # is not thread-safe (and pdfminer is pure Python, so threads would not help anyway)
+    with pdfplumber.open(file_like) as pdf:
+        for page in pdf.pages:
+            yield _pdf_page_text(page)
+
+def read_pdf(file_like, max_pages: Optional[int] = None) -> str:
+    """Page texts joined by newlines; stops after max_pages (pages past the cap are never extracted)."""
+    out = io.StringIO()
     try:
-        with pdfplumber.open(file_like) as pdf:
-            return "\n".join(p.extract_text() or "" for p in pdf.pages)
+        for i, text in enumerate(islice(iter_pdf_pages(file_like), max_pages)):
+            if i:
+                out.write("\n")
+            out.write(text)
     except Exception:
         return ""
+    return out.getvalue()
+
+@st.cache_data(show_spinner=False)
+def read_table_bytes(name: str, data: bytes) -> pd.DataFrame:
+    """CSV/XLSX upload -> DataFrame, memoized on the upload's bytes."""
+    pd = _lazy("pandas")  # only pages with a table upload pay for the import
+    bio = io.BytesIO(data)
+    if name.endswith(".csv"):
+        return pd.read_csv(bio)
+    # Pin the engine (no autodetect); calamine is Rust-backed and much faster than openpyxl
+    if _lazy("python_calamine") is not None:
+        try:
+            return pd.read_excel(bio, engine="calamine")
+        except ValueError:  # pandas < 2.2 has no calamine engine
+            bio.seek(0)
+    return pd.read_excel(bio, engine="openpyxl")
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
 
-def read_docx_text_bytes(docx_bytes: bytes) -> str:
-    """Lightweight text extraction from DOCX for industry detection (doesn't alter formatting)."""
-    if DocxDocument is None:
+def read_docx_text_bytes(docx_bytes: bytes, max_chars: Optional[int] = None) -> str:
+    """Lightweight text extraction from DOCX for industry detection (doesn't alter formatting).
+
+    Streams word/document.xml with lxml iterparse instead of building python-docx's object tree,
+    and stops at the first paragraph end once max_chars of text have been read.
+    """
+    etree = _lazy("lxml.etree")
+    if etree is None:
         return ""
     try:
-        bio = io.BytesIO(docx_bytes)
-        doc = DocxDocument(bio)
-        return "\n".join(p.text for p in doc.paragraphs)
+        lines: List[str] = []
+        buf: List[str] = []
+        size = 0
+        with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zf, zf.open("word/document.xml") as f:
+            for _, el in etree.iterparse(f, events=("end",), tag=(_W_NS + "t", _W_NS + "p")):
+                if el.tag == _W_NS + "t":
+                    if el.text:
+                        buf.append(el.text)
+                else:
+                    lines.append("".join(buf))
+                    buf.clear()
+                    size += len(lines[-1]) + 1
+                    if max_chars is not None and size >= max_chars:
+                        break
+                el.clear()
+        return "\n".join(lines)
     except Exception:
         return ""
 
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _parse_docx_cached(docx_bytes: bytes):
+    """Parsed (unzipped + lxml) DOCX, shared across reruns; callers must deepcopy before mutating."""
+    return _lazy("docx").Document(io.BytesIO(docx_bytes))
+
+def load_docx_for_edit(docx_bytes: bytes):
+    """Fresh editable Document: deepcopy of the cached parse instead of re-unzipping/re-parsing."""
+    return copy.deepcopy(_parse_docx_cached(docx_bytes))
+
 # ==========================
 # Helpers: .DOC → .DOCX conversion (best-effort)
 # ==========================
+UNO_START_TIMEOUT = 30  # seconds to wait for the listener to accept connections
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@st.cache_resource(show_spinner=False)
+def _uno_listener() -> Optional[Tuple[subprocess.Popen, int]]:
+    """One long-lived unoserver (soffice --accept=...) per process, so .doc uploads skip soffice start-up."""
+    if shutil.which("unoserver") is None:
+        return None
+    port, uno_port = _free_port(), _free_port()
+    proc = subprocess.Popen(
+        ["unoserver", "--interface", "127.0.0.1", "--port", str(port), "--uno-port", str(uno_port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    atexit.register(proc.terminate)
+    deadline = time.monotonic() + UNO_START_TIMEOUT
+    while time.monotonic() < deadline and proc.poll() is None:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    return None
+
+def _try_uno_convert(doc_bytes: bytes) -> Optional[bytes]:
+    listener = _uno_listener()
+    if listener is not None and listener[0].poll() is not None:
+        # Listener died (soffice crash): drop the cached one and start afresh
+        _uno_listener.clear()
+        listener = _uno_listener()
+    if listener is None:
+        return None
+    port = str(listener[1])
+    try:
+        client = getattr(_lazy("unoserver.client"), "UnoClient", None)
+        if client is not None:
+            return client(port=port).convert(indata=doc_bytes, convert_to="docx") or None
+        r = subprocess.run(
+            ["unoconvert", "--port", port, "--convert-to", "docx", "-", "-"],
+            input=doc_bytes, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        return r.stdout or None
+    except Exception:
+        return None
+
 def _try_libreoffice_convert(doc_bytes: bytes) -> Optional[bytes]:
+    converted = _try_uno_convert(doc_bytes)
+    if converted:
+        return converted
+    # No unoserver on this host: one-shot soffice (pays the 2-3s start-up every time)
     with tempfile.TemporaryDirectory() as tmpdir:
         in_path = os.path.join(tmpdir, "in.doc")
         out_path = os.path.join(tmpdir, "in.docx")
@@ -73,10 +221,21 @@ def _try_libreoffice_convert(doc_bytes: bytes) -> Optional[bytes]:
             return None
     return None
 
+PANDOC = shutil.which("pandoc")  # probed once; called directly (pypandoc runs pandoc 3x per conversion)
+
+def _pandoc_input_format(data: bytes) -> Optional[str]:
+    """Pandoc has no reader for binary Word 97 .doc, but many ".doc" uploads are really
+    RTF or HTML saved under the old extension."""
+    head = data[:512].lstrip()
+    if head.startswith(b"{\\rtf"):
+        return "rtf"
+    if head[:64].lower().startswith((b"<html", b"<!doctype html", b"<?xml")):
+        return "html"
+    return None
+
 def _try_pandoc_convert(doc_bytes: bytes) -> Optional[bytes]:
-    try:
-        import pypandoc  # type: ignore
-    except Exception:
+    fmt = _pandoc_input_format(doc_bytes)
+    if PANDOC is None or fmt is None:
         return None
     with tempfile.TemporaryDirectory() as tmpdir:
         in_path = os.path.join(tmpdir, "in.doc")
@@ -84,7 +243,10 @@ def _try_pandoc_convert(doc_bytes: bytes) -> Optional[bytes]:
         with open(in_path, "wb") as f:
             f.write(doc_bytes)
         try:
-            pypandoc.convert_file(in_path, "docx", outputfile=out_path)
+            subprocess.run(
+                [PANDOC, "-f", fmt, "-t", "docx", in_path, "-o", out_path],
+                check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
             if os.path.exists(out_path):
                 with open(out_path, "rb") as f:
                     return f.read()
@@ -92,7 +254,10 @@ def _try_pandoc_convert(doc_bytes: bytes) -> Optional[bytes]:
             return None
     return None
 
+@st.cache_data(show_spinner="Converting .doc…")
 def convert_doc_to_docx_bytes(doc_bytes: bytes) -> bytes:
+    """.doc -> .docx bytes, memoized on the upload's bytes: detection and Generate
+    share one conversion, and reruns never start soffice/pandoc again."""
     converted = _try_libreoffice_convert(doc_bytes)
     if converted:
         return converted
@@ -104,62 +269,226 @@ def convert_doc_to_docx_bytes(doc_bytes: bytes) -> bytes:
         "Please save the file as .docx in Microsoft Word and re-upload."
     )
 
+@st.cache_data(show_spinner=False)
+def extract_prior_text(name: str, data: bytes) -> str:
+    """Plain text of an uploaded prior TPD (.docx/.doc/.pdf), memoized on the upload's bytes
+    so widget reruns skip re-parsing (and re-converting .doc)."""
+    name = name.lower()
+    if name.endswith(".docx"):
+        return read_docx_text_bytes(data, max_chars=DOCX_DETECT_MAX_CHARS)
+    if name.endswith(".doc"):
+        try:
+            return read_docx_text_bytes(convert_doc_to_docx_bytes(data), max_chars=DOCX_DETECT_MAX_CHARS)
+        except Exception:
+            return ""
+    if name.endswith(".pdf"):
+        return read_pdf(io.BytesIO(data), max_pages=PDF_DETECT_MAX_PAGES)
+    return ""
+
+def irl_text_from_upload(name: str, data: bytes) -> str:
+    """Client info upload -> text block to insert (CSV rows become "- a | b | c" lines)."""
+    if name.endswith(".csv"):
+        df = read_table_bytes(name, data)
+        # map(str) per cell: astype(str) leaves blank cells as float NaN on pandas 3
+        return "\n".join("- " + " | ".join(map(str, row)) for row in df.itertuples(index=False, name=None))
+    return data.decode("utf-8", errors="ignore")
+
+def memo_by_upload(upload, key: str, compute: Callable[[], Any]) -> Any:
+    """Session-scoped memo keyed on the upload's file_id.
+
+    st.cache_data has to hash the full upload bytes on every rerun just to find its entry;
+    a file_id lookup is O(1). One entry per key: a new upload replaces the old result.
+    """
+    file_id = getattr(upload, "file_id", None)
+    if file_id is None:
+        return compute()
+    memo = st.session_state.setdefault("_upload_memo", {})
+    hit = memo.get(key)
+    if hit is None or hit[0] != file_id:
+        hit = memo[key] = (file_id, compute())
+    return hit[1]
+
 # ==========================
 # Helpers: DOCX formatting-preserving replacements
 # ==========================
 def _iter_all_paragraphs(doc):
-    for p in doc.paragraphs:
-        yield p
-    for tbl in doc.tables:
-        for row in tbl.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    yield p
+    """Every <w:p> in body, tables (incl. nested), headers and footers, via lxml's C-level iter()."""
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+    w_p = qn("w:p")
+    for p_el in doc.element.body.iter(w_p):
+        yield Paragraph(p_el, doc)
+    seen = set()
     for section in doc.sections:
-        if section.header:
-            for p in section.header.paragraphs:
-                yield p
-            for tbl in section.header.tables:
-                for row in tbl.rows:
-                    for cell in row.cells:
-                        for p in cell.paragraphs:
-                            yield p
-        if section.footer:
-            for p in section.footer.paragraphs:
-                yield p
-            for tbl in section.footer.tables:
-                for row in tbl.rows:
-                    for cell in row.cells:
-                        for p in cell.paragraphs:
-                            yield p
-
-def _replace_preserving_style(paragraph: "Paragraph", old: str, new: str) -> int:
-    if old not in paragraph.text:
+        for part in (section.header, section.footer):
+            # A linked header/footer has no part of its own; touching _element would
+            # add one (and mutate a shared cached Document)
+            if part.is_linked_to_previous:
+                continue
+            root = part._element
+            if id(root) in seen:
+                continue
+            seen.add(id(root))
+            for p_el in root.iter(w_p):
+                yield Paragraph(p_el, part)
+
+def _compile_replacements(replacements: Dict[str, str]) -> Optional["re.Pattern[str]"]:
+    """One alternation over all keys, longest first so e.g. "FY 2023/24" wins over "FY 2023"."""
+    keys = sorted((k for k in replacements if k), key=len, reverse=True)
+    if not keys:
+        return None
+    return re.compile("|".join(re.escape(k) for k in keys))
+
+def _build_automaton(replacements: Dict[str, str]):
+    """Aho–Corasick automaton over the keys for a linear-time "any key here?" probe (None if unavailable)."""
+    ahocorasick = _lazy("ahocorasick")  # pyahocorasick
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for k in replacements:
+        if k:
+            automaton.add_word(k, k)
+    automaton.make_automaton()
+    return automaton
+
+def _splice_matches(automaton, text: str, replacements: Dict[str, str]) -> Tuple[str, int]:
+    """Leftmost-longest, non-overlapping splice from automaton hits (same result as the alternation)."""
+    hits = sorted((end - len(k) + 1, -len(k), k) for end, k in automaton.iter(text))
+    if not hits:
+        return text, 0
+    out, pos, n = [], 0, 0
+    for start, _, k in hits:
+        if start < pos:
+            continue
+        out.append(text[pos:start])
+        out.append(replacements[k])
+        pos = start + len(k)
+        n += 1
+    out.append(text[pos:])
+    return "".join(out), n
+
+LITERAL_REPLACE_MAX_KEYS = 8  # up to this many keys, chained str.replace beats regex/automaton dispatch
+
+def _overlaps(a: str, b: str) -> bool:
+    """True if a and b could compete for the same characters (substring or suffix/prefix overlap)."""
+    return a in b or b in a or any(a.endswith(b[:i]) or b.endswith(a[:i]) for i in range(1, min(len(a), len(b))))
+
+def _literal_chain(replacements: Dict[str, str]) -> Optional[Callable[[str], Tuple[str, int]]]:
+    """Chained str.replace replacer for small key sets, or None when chaining could differ from
+    the single-pass alternation (overlapping keys, or an earlier value that a later key could hit)."""
+    items = [(k, v) for k, v in replacements.items() if k]
+    if len(items) > LITERAL_REPLACE_MAX_KEYS:
+        return None
+    for i, (k, v) in enumerate(items):
+        if any(_overlaps(k, k2) or _overlaps(v, k2) for k2, _ in items[i + 1:]):
+            return None
+
+    def replacer(full: str) -> Tuple[str, int]:
+        n = 0
+        for k, v in items:
+            c = full.count(k)
+            if c:
+                full = full.replace(k, v)
+                n += c
+        return full, n
+    return replacer
+
+# Run content that reads as text, in document order (same mapping as python-docx's Run.text)
+_RUN_TEXT_XPATH = "./w:r/w:t | ./w:r/w:tab | ./w:r/w:br[not(@w:type) or @w:type='textWrapping'] | ./w:r/w:cr"
+
+def _run_content(text: str) -> list:
+    """<w:t>/<w:tab/>/<w:br/> elements for text, splitting on tabs and newlines like Run.text does."""
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    out = []
+    for piece in re.split(r"(\t|\r?\n|\r)", text):
+        if piece == "\t":
+            out.append(OxmlElement("w:tab"))
+        elif piece in ("\n", "\r\n", "\r"):
+            out.append(OxmlElement("w:br"))
+        elif piece:
+            t = OxmlElement("w:t")
+            t.text = piece
+            t.set(qn("xml:space"), "preserve")
+            out.append(t)
+    return out
+
+def _replace_preserving_style(paragraph: "Paragraph", replacer: Callable[[str], Tuple[str, int]]) -> int:
+    # Work on the run content elements directly; <w:rPr> is never touched, so the
+    # first run keeps its formatting without round-tripping through Run.style.
+    # Tabs and line breaks join as \t/\n so keys never match across them and they
+    # are rebuilt in order with the text.
+    from docx.oxml.ns import qn
+    els = paragraph._p.xpath(_RUN_TEXT_XPATH)
+    if not els:
         return 0
-    runs = paragraph.runs
-    full = "".join(r.text for r in runs)
-    n = full.count(old)
-    full_new = full.replace(old, new)
-    if runs:
-        style = runs[0].style
-        for r in runs: r.text = ""
-        runs[0].text = full_new
-        runs[0].style = style
-    else:
-        paragraph.add_run(full_new)
+    w_t, w_tab = qn("w:t"), qn("w:tab")
+    full_new, n = replacer("".join(
+        (e.text or "") if e.tag == w_t else "\t" if e.tag == w_tab else "\n" for e in els
+    ))
+    if not n:
+        return 0  # no-match path never writes to the XML
+    anchor = els[0]
+    for e in _run_content(full_new):
+        anchor.addprevious(e)
+    for e in els:
+        r = e.getparent()
+        r.remove(e)
+        # Drop runs left with nothing but formatting (fields, drawings, page breaks keep theirs)
+        if all(c.tag == qn("w:rPr") for c in r):
+            r.getparent().remove(r)
     return n
 
-def docx_replace_text_everywhere(doc: "DocxDocument", replacements: Dict[str, str]) -> int:
-    total = 0
-    for p in _iter_all_paragraphs(doc):
-        for old, new in replacements.items():
-            total += _replace_preserving_style(p, old, new)
-    return total
+def docx_replace_text_everywhere(paragraphs: List["Paragraph"], replacements: Dict[str, str]) -> int:
+    """Apply replacements to paragraphs materialized once via list(_iter_all_paragraphs(doc))."""
+    if not any(replacements):
+        return 0
+    replacer = _literal_chain(replacements)
+    if replacer is None:
+        automaton = _build_automaton(replacements)
+        if automaton is not None:
+            # One linear scan per paragraph and no regex engine call
+            replacer = lambda full: _splice_matches(automaton, full, replacements)
+        else:
+            replacer = functools.partial(_compile_replacements(replacements).subn, lambda m: replacements[m.group(0)])
+    return sum(_replace_preserving_style(p, replacer) for p in paragraphs)
+
+def _make_p(text: str):
+    """Bare <w:p><w:r>…</w:r></w:p> (no run for empty text, like add_paragraph("")); tabs and
+    newlines become <w:tab/>/<w:br/> as add_paragraph(text) would make them."""
+    from docx.oxml import OxmlElement
+    p = OxmlElement("w:p")
+    if text:
+        r = OxmlElement("w:r")
+        r.extend(_run_content(text))
+        p.append(r)
+    return p
+
+def docx_append_paragraphs(doc: "docx.document.Document", lines: List[str]) -> None:
+    """Append plain paragraphs at the end of the body.
+
+    Document.add_paragraph rescans the body's children to find <w:sectPr> and builds
+    Paragraph/Run wrappers on every call; here the <w:p> elements are built directly
+    and each is slotted in front of <w:sectPr> in constant time.
+    """
+    if not lines:
+        return
+    body = doc.element.body
+    sect_pr = body.sectPr
+    for text in lines:
+        if sect_pr is not None:
+            sect_pr.addprevious(_make_p(text))
+        else:
+            body.append(_make_p(text))
+
+_YEAR_RE = re.compile(r"(?:FY\s*-?_?\s*)?(20\d{2})", re.I)
+_RANGE_RE = re.compile(r"(?:FY\s*)?(20\d{2})\s*/\s*(\d{2})", re.I)
+_RANGE_TOKEN_RE = re.compile(r"(?:FY\s*)?(20\d{2}\s*/\s*\d{2})")
+_RANGE_BUMP_RE = re.compile(r"(20\d{2})\s*/\s*(\d{2})")
 
 def detect_years(text: str) -> set:
-    years = set(re.findall(r"(?:FY\s*-?_?\s*)?(20\d{2})", text, flags=re.I))
-    ranges = re.findall(r"(?:FY\s*)?(20\d{2})\s*/\s*(\d{2})", text, flags=re.I)
-    for y, yy in ranges:
+    years = set(_YEAR_RE.findall(text))
+    for y, yy in _RANGE_RE.findall(text):
         try:
             y1 = int(y); y2 = (y1 // 100) * 100 + int(yy)
             years.add(str(y1)); years.add(str(y2))
@@ -168,29 +497,55 @@ def detect_years(text: str) -> set:
     return years
 
 def bump_range_token(token: str, new_start_year: int) -> str:
-    m = re.search(r"(20\d{2})\s*/\s*(\d{2})", token)
-    if not m:
-        return token
-    y1 = new_start_year; y2 = (y1 % 100) + 1
-    return re.sub(r"(20\d{2})\s*/\s*(\d{2})", f"{y1}/{y2:02d}", token)
-
-def build_rollforward_replacements(doc: "DocxDocument", new_fy: int, report_date: str) -> Dict[str, str]:
-    text_all = "\n".join(p.text for p in _iter_all_paragraphs(doc))
-    years = detect_years(text_all) or {str(new_fy - 1)}
-    repl: Dict[str, str] = {}
-    for y in years:
-        repl[f"FY{y}"] = f"FY{new_fy}"
-        repl[f"FY {y}"] = f"FY {new_fy}"
-        repl[f"FYE {y}"] = f"FYE {new_fy}"
-        repl[f"Financial Year {y}"] = f"Financial Year {new_fy}"
-        repl[f"Fiscal Year {y}"] = f"Fiscal Year {new_fy}"
-    tokens = re.findall(r"(?:FY\s*)?(20\d{2}\s*/\s*\d{2})", text_all)
-    for t in set(tokens):
+    # One sub pass; subn's count replaces the separate search probe
+    y1 = new_start_year; y2 = (y1 + 1) % 100
+    bumped, n = _RANGE_BUMP_RE.subn(f"{y1}/{y2:02d}", token)
+    return bumped if n else token
+
+_FY_FORMATS = ("FY{}", "FY {}", "FYE {}", "Financial Year {}", "Fiscal Year {}")
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _rollforward_index(docx_bytes: bytes) -> Tuple[Tuple[Tuple[str, str], ...], Tuple[str, ...]]:
+    """FY spellings present in a prior DOCX, cached on its bytes: ((key, format), ...) for
+    single years plus the FY range tokens. None of it depends on the target FY, so
+    re-generating for another year or report date skips the paragraph walk."""
+    # Scan paragraph by paragraph rather than building one document-sized string
+    texts = [p.text for p in _iter_all_paragraphs(_parse_docx_cached(docx_bytes))]
+    years: set = set()
+    tokens: set = set()
+    for text in texts:
+        years |= detect_years(text)
+        tokens.update(_RANGE_TOKEN_RE.findall(text))
+    year_keys = {t.format(y): t for y in years for t in _FY_FORMATS}
+    # Most of the FY variants never occur; keep only keys the longest-first
+    # alternation actually hits, so the replace pass scans for fewer patterns
+    pattern = _compile_replacements(dict.fromkeys(chain(year_keys, tokens), ""))
+    found = {m for text in texts for m in pattern.findall(text)} if pattern is not None else set()
+    return (
+        tuple((k, t) for k, t in year_keys.items() if k in found),
+        tuple(t for t in tokens if t in found),
+    )
+
+def build_rollforward_replacements(docx_bytes: bytes, new_fy: int, report_date: str) -> Dict[str, str]:
+    year_keys, tokens = _rollforward_index(docx_bytes)
+    repl: Dict[str, str] = {k: t.format(new_fy) for k, t in year_keys}
+    for t in tokens:
         repl[t] = bump_range_token(t, new_fy)
     if report_date:
         repl["Report Date"] = f"Report Date: {report_date}"
     return repl
 
+# ==========================
+# Helpers: benchmark summary
+# ==========================
+def summarize_benchmark(df: pd.DataFrame) -> Tuple[int, int, int]:
+    """(accepted, rejected, total) from the Decision column, lowercased and counted in one pass."""
+    col = df.get("Decision")
+    if col is None:
+        return 0, 0, len(df)
+    vc = col.astype("string").str.lower().value_counts(dropna=True)
+    return int(vc.get("accept", 0)), int(vc.get("reject", 0)), len(df)
+
 # ==========================
 # Industry detection (from prior TPD text)
 # ==========================
@@ -224,38 +579,126 @@ INDUSTRY_KEYWORDS = {
         "consulting", "legal services", "accounting", "advisory", "engineering services", "staff augmentation"
     ],
 }
+@st.cache_resource(show_spinner=False)
+def _industry_keywords_lower() -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """Keywords lowered once per process, not on every detection call or rerun."""
+    return tuple((label, tuple(k.lower() for k in kws)) for label, kws in INDUSTRY_KEYWORDS.items())
+
+@st.cache_resource(show_spinner=False)
+def _industry_automaton():
+    """Aho–Corasick automaton over all industry keywords (None without pyahocorasick)."""
+    ahocorasick = _lazy("ahocorasick")
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for _, kws in _industry_keywords_lower():
+        for k in kws:
+            automaton.add_word(k, k)
+    automaton.make_automaton()
+    return automaton
+
 def detect_industry_label(text: str) -> str:
     low = (text or "").lower()
-    scores = {label: 0 for label in INDUSTRY_KEYWORDS}
-    for label, kws in INDUSTRY_KEYWORDS.items():
-        for k in kws:
-            if k in low:
-                scores[label] += 1
+    automaton = _industry_automaton()
+    keywords = _industry_keywords_lower()
+    if automaton is not None:
+        # One pass over the document finds every keyword present (overlaps included)
+        found = {k for _, k in automaton.iter(low)}
+        scores = {label: sum(k in found for k in kws) for label, kws in keywords}
+    else:
+        scores = {label: sum(k in low for k in kws) for label, kws in keywords}
     best = max(scores.items(), key=lambda x: x[1])
     return best[0] if best[1] > 0 else "General / Macro"
 
+# ==========================
+# Helpers: shared HTTP session
+# ==========================
+TITLE_FETCH_WORKERS = 16
+HTTP_POOL_SIZE = 32
+WB_HOST = "https://api.worldbank.org/"
+
+@st.cache_resource(show_spinner=False)
+def _http():
+    """Shared session so World Bank calls and parallel title fetches reuse pooled TCP/TLS
+    connections; World Bank responses are kept in a persistent SQLite cache when
+    requests-cache is installed."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    requests_cache = _lazy("requests_cache")
+    if requests_cache is not None:
+        session = requests_cache.CachedSession(
+            cache_name=".tpa_http_cache", backend="sqlite",
+            expire_after=timedelta(days=7), allowable_codes=(200,),
+            # First match wins: annual indicator data refreshes daily, the country list monthly.
+            # Everything else (user page URLs) bypasses the store: saving a response reads the
+            # whole body, which would defeat fetch_title's 64 KiB streaming cap
+            urls_expire_after={
+                "api.worldbank.org/v2/country/*/indicator": timedelta(days=1),
+                "api.worldbank.org/v2/country": timedelta(days=30),
+                "*": requests_cache.DO_NOT_CACHE,
+            },
+        )
+    else:
+        session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Retry transient World Bank / rate-limit failures instead of caching an empty result.
+    # Only for that host (arbitrary user URLs fail fast), and without honouring Retry-After,
+    # which urllib3 does not cap: a server asking for an hour would stall Generate for an hour
+    session.mount(WB_HOST, HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=Retry(
+            total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504),
+            respect_retry_after_header=False,
+        ),
+    ))
+    session.headers.update({"User-Agent": "TPA/1.0", "Accept-Encoding": "gzip, deflate"})
+    return session
+
 # ==========================
 # Auto Industry Research (World Bank) — sector packs (open-ended default)
 # ==========================
 WB_BASE = "https://api.worldbank.org/v2"
-
-def wb_get_countries() -> List[Dict[str, Any]]:
-    try:
-        r = requests.get(f"{WB_BASE}/country?format=json&per_page=400", timeout=15)
-        data = r.json()
-        return data[1] if isinstance(data, list) and len(data) > 1 else []
-    except Exception:
-        return []
+WB_FETCH_WORKERS = 8
+
+@st.cache_data(ttl=86400, show_spinner=False)
+def _wb_countries_cached() -> List[Dict[str, Any]]:
+    # Raises on failure so a network blip is retried next time instead of caching []
+    r = _http().get(f"{WB_BASE}/country?format=json&per_page=400", timeout=15)
+    r.raise_for_status()
+    data = r.json()
+    return data[1] if isinstance(data, list) and len(data) > 1 else []
+
+@st.cache_resource(ttl=86400, show_spinner=False)
+def _wb_country_index() -> Tuple[Mapping[str, Tuple[str, str]], Tuple[Tuple[str, Tuple[str, str]], ...]]:
+    """Exact-match index (lowercased name / id / ISO2 -> (id, name)) plus the lowercased names
+    in API order for the substring fallback; built once per country-list refresh and shared
+    read-only (cache_resource: no per-call unpickling)."""
+    exact: Dict[str, Tuple[str, str]] = {}
+    names = []
+    for c in _wb_countries_cached():
+        hit = (c.get("id"), c.get("name"))
+        name = (c.get("name") or "").lower()
+        for key in (name, (c.get("id") or "").lower(), (c.get("iso2Code") or "").lower()):
+            if key:
+                exact.setdefault(key, hit)
+        names.append((name, hit))
+    return MappingProxyType(exact), tuple(names)
 
 def wb_resolve_country(user_input: str) -> Optional[Tuple[str, str]]:
     ui = (user_input or "").strip().lower()
-    countries = wb_get_countries()
-    for c in countries:
-        name = (c.get("name") or "").lower()
-        iso2 = (c.get("id") or "").lower()
-        if ui == name or ui == iso2 or ui in name:
-            return (c.get("id"), c.get("name"))
-    return None
+    if not ui:
+        return None
+    try:
+        exact, names = _wb_country_index()
+    except Exception:
+        return None
+    hit = exact.get(ui)
+    if hit is not None:
+        return hit
+    return next((hit for name, hit in names if ui in name), None)
 
 # Indicator catalog (default pack + sector add-ons)
 WB_INDICATORS_PACKS: Dict[str, Dict[str, Tuple[str, str]]] = {
@@ -299,13 +742,24 @@ WB_INDICATORS_PACKS: Dict[str, Dict[str, Tuple[str, str]]] = {
     },
 }
 
+INDUSTRY_OPTIONS: Tuple[str, ...] = tuple(WB_INDICATORS_PACKS)
+
+@st.cache_resource(show_spinner=False)
+def _merged_packs() -> Mapping[str, Mapping[str, Tuple[str, str]]]:
+    """Macro pack merged into each sector pack; built once per process (the script body
+    itself runs again on every rerun) and shared read-only."""
+    return MappingProxyType({
+        label: MappingProxyType({**WB_INDICATORS_PACKS["General / Macro"], **pack})
+        for label, pack in WB_INDICATORS_PACKS.items()
+    })
+
 def wb_fetch_indicator_series(iso2: str, indicator: str) -> Dict[str, Any]:
     url = f"{WB_BASE}/country/{iso2}/indicator/{indicator}?format=json&per_page=70"
     series = []
     latest_year = None
     latest_value = None
     try:
-        r = requests.get(url, timeout=20)
+        r = _http().get(url, timeout=20)
         data = r.json()
         if isinstance(data, list) and len(data) > 1 and isinstance(data[1], list):
             for row in data[1]:
@@ -316,10 +770,11 @@ def wb_fetch_indicator_series(iso2: str, indicator: str) -> Dict[str, Any]:
                 except Exception:
                     continue
                 series.append((y, v))
-            series.sort()
-            for y, v in reversed(series):
-                latest_year, latest_value = y, v
-                break
+            # The API returns newest year first: the first valid row is the latest,
+            # and one reverse gives the ascending series without sorting
+            if series:
+                latest_year, latest_value = series[0]
+            series.reverse()
     except Exception:
         pass
     return {"latest_year": latest_year, "latest_value": latest_value, "series": series, "source_url": url}
@@ -329,10 +784,13 @@ def auto_sector_research(country_input: str, industry_label: str) -> Dict[str, A
     if not resolved:
         return {"note": "Could not resolve country; please use a standard name (e.g., Singapore).", "items": {}}
     iso2, country_name = resolved
-    pack = {**WB_INDICATORS_PACKS["General / Macro"], **WB_INDICATORS_PACKS.get(industry_label, {})}
+    packs = _merged_packs()
+    pack = packs.get(industry_label, packs["General / Macro"])
     out = {"country": country_name, "iso2": iso2, "industry": industry_label, "items": {}, "notes": []}
-    for key, (code, label) in pack.items():
-        data = wb_fetch_indicator_series(iso2, code)
+    # Indicator requests are independent and network-bound: issue them concurrently
+    with ThreadPoolExecutor(max_workers=min(WB_FETCH_WORKERS, len(pack))) as ex:
+        series = list(ex.map(lambda code: wb_fetch_indicator_series(iso2, code), [code for code, _ in pack.values()]))
+    for (key, (code, label)), data in zip(pack.items(), series):
         out["items"][key] = {**data, "code": code, "label": f"World Bank — {label}"}
         if data["latest_year"] is None:
             out["notes"].append(f"Missing recent data: {label}")
@@ -377,15 +835,51 @@ def format_sector_update_text(sector_pack: Dict[str, Any]) -> Tuple[List[str], L
 
     return lines, foots
 
+# <title> lives in <head>, so only the first chunk of the page is read and scanned
+_TITLE_RE = re.compile(rb"<title[^>]*>(.*?)</title>", re.I | re.S)
+_TITLE_MAX_BYTES = 65536
+
+def _extract_title(buf: bytes, encoding: Optional[str] = None) -> Optional[str]:
+    m = _TITLE_RE.search(buf)
+    if not m:
+        return None
+    title = html.unescape(m.group(1).decode(encoding or "utf-8", errors="ignore"))
+    title = " ".join(title.split())
+    return title[:120] or None
+
+@st.cache_data(ttl=timedelta(days=7), show_spinner=False)
+def _fetch_title_cached(url: str) -> Optional[str]:
+    # Raises on timeouts, connection errors and non-2xx so only real pages are
+    # cached; a server that is down now is tried again on the next call
+    buf = bytearray()
+    with _http().get(url, timeout=10, stream=True) as r:
+        r.raise_for_status()
+        for chunk in r.iter_content(chunk_size=16384):
+            buf += chunk
+            if len(buf) >= _TITLE_MAX_BYTES or _TITLE_RE.search(buf):
+                break
+        encoding = r.encoding
+    return _extract_title(bytes(buf[:_TITLE_MAX_BYTES]), encoding)
+
 def fetch_title(url: str) -> str:
+    """Page title, or the URL itself when the page has none or can't be fetched."""
     try:
-        r = requests.get(url, timeout=10)
-        soup = BeautifulSoup(r.text, "html.parser")
-        title = soup.title.string.strip() if soup.title and soup.title.string else url
-        return title[:120]
+        return _fetch_title_cached(url) or url
     except Exception:
         return url
 
+def parse_url_list(text: str) -> List[str]:
+    """One URL per non-blank line, stripped once, duplicates dropped (first occurrence kept)."""
+    return list(dict.fromkeys(s for s in (ln.strip() for ln in (text or "").splitlines()) if s))
+
+def fetch_titles(urls: Tuple[str, ...]) -> List[str]:
+    """Titles for all URLs, in order. Each goes through the per-URL fetch_title cache, so
+    adding a URL only fetches the new one; misses run concurrently on the shared session."""
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(TITLE_FETCH_WORKERS, len(urls))) as ex:
+        return list(ex.map(fetch_title, urls))
+
 # ==========================
 # PAGE: TPD Draft (industry-aware + roll-forward vs rewrite)
 # ==========================
@@ -419,24 +913,14 @@ if page == "TPD Draft":
     detected_industry = "General / Macro"
     prior_text_for_detection = ""
     if prior is not None:
-        name = prior.name.lower()
-        if name.endswith(".docx"):
-            prior_text_for_detection = read_docx_text_bytes(prior.getvalue())
-        elif name.endswith(".doc"):
-            try:
-                converted = convert_doc_to_docx_bytes(prior.getvalue())
-                prior_text_for_detection = read_docx_text_bytes(converted)
-            except Exception:
-                prior_text_for_detection = ""
-        elif name.endswith(".pdf"):
-            prior_text_for_detection = read_pdf(io.BytesIO(prior.getvalue()))
+        prior_text_for_detection = memo_by_upload(prior, "prior_text", lambda: extract_prior_text(prior.name, prior.getvalue()))
         detected_industry = detect_industry_label(prior_text_for_detection)
 
     st.write("**Detected industry (from prior TPD, editable):**")
     industry_choice = st.selectbox(
         "Industry",
-        options=list(WB_INDICATORS_PACKS.keys()),
-        index=list(WB_INDICATORS_PACKS.keys()).index(detected_industry) if detected_industry in WB_INDICATORS_PACKS else 0,
+        options=INDUSTRY_OPTIONS,
+        index=INDUSTRY_OPTIONS.index(detected_industry) if detected_industry in WB_INDICATORS_PACKS else 0,
         help="Auto-detected from prior TPD text. You can override."
     )
 
@@ -455,7 +939,7 @@ if page == "TPD Draft":
         bench_file = st.file_uploader("Attach benchmark export (CSV/XLSX)", type=["csv", "xlsx"], key="bench")
         if bench_file is not None:
             try:
-                bench_df = pd.read_csv(bench_file) if bench_file.name.endswith(".csv") else pd.read_excel(bench_file)
+                bench_df = memo_by_upload(bench_file, "bench_df", lambda: read_table_bytes(bench_file.name, bench_file.getvalue()))
                 st.caption("Loaded benchmark for inclusion in draft.")
             except Exception as e:
                 st.error(f"Could not read benchmark: {e}")
@@ -464,11 +948,7 @@ if page == "TPD Draft":
         irl_up = st.file_uploader("Attach client info (TXT/CSV) to insert", type=["txt", "csv"], key="irl")
         if irl_up is not None:
             try:
-                if irl_up.name.endswith(".csv"):
-                    _df = pd.read_csv(irl_up)
-                    irl_text = "\n".join("- " + " | ".join(map(str, row)) for _, row in _df.iterrows())
-                else:
-                    irl_text = irl_up.read().decode("utf-8", errors="ignore")
+                irl_text = memo_by_upload(irl_up, "irl_text", lambda: irl_text_from_upload(irl_up.name, irl_up.getvalue()))
                 st.caption("Loaded client information for inclusion.")
             except Exception as e:
                 st.error(f"Could not read client info: {e}")
@@ -477,7 +957,7 @@ if page == "TPD Draft":
     st.subheader("Industry sources (optional)")
     st.write("We will auto-research official stats by default (World Bank). You can also add specific URLs and upload reports.")
     urls = st.text_area("Extra source URLs (one per line, optional)", value="")
-    user_url_list = [u.strip() for u in urls.splitlines() if u.strip()]
+    user_url_list = parse_url_list(urls)
     user_reports = st.file_uploader("Upload market/industry reports (PDF/DOCX/TXT — optional)", type=["pdf","docx","txt"], accept_multiple_files=True)
 
     # Advanced text replacements
@@ -507,6 +987,7 @@ if page == "TPD Draft":
                     user_repl = {}
 
             # 3) Prepare DOCX/PDF flows
+            DocxDocument = getattr(_lazy("docx"), "Document", None)
             name = prior.name.lower()
             is_docx = name.endswith(".docx") and (DocxDocument is not None)
             is_doc = name.endswith(".doc")
@@ -528,16 +1009,16 @@ if page == "TPD Draft":
                 if DocxDocument is None:
                     st.error("python-docx is not available in this environment.")
                 else:
-                    doc = DocxDocument(prior_buffer)
-                    auto_repl = build_rollforward_replacements(doc, int(new_fy), report_date.strip())
+                    docx_bytes = prior_buffer.getvalue()
+                    doc = load_docx_for_edit(docx_bytes)
+                    auto_repl = build_rollforward_replacements(docx_bytes, int(new_fy), report_date.strip())
                     auto_repl.update(user_repl)
-                    hits = docx_replace_text_everywhere(doc, auto_repl)
+                    hits = docx_replace_text_everywhere(list(_iter_all_paragraphs(doc)), auto_repl)
 
                     # Conditional inserts
                     if bench_df is not None and not bench_df.empty:
-                        acc = (bench_df.get("Decision", "").astype(str).str.lower() == "accept").sum()
-                        rej = (bench_df.get("Decision", "").astype(str).str.lower() == "reject").sum()
-                        summary = f"Vendor study summary: {acc} accepted, {rej} rejected, {len(bench_df)} total comparables."
+                        acc, rej, total = summarize_benchmark(bench_df)
+                        summary = f"Vendor study summary: {acc} accepted, {rej} rejected, {total} total comparables."
                         p = doc.add_paragraph()
                         p.add_run("\nEconomic Analysis — Benchmark Update: ").bold = True
                         doc.add_paragraph(summary)
@@ -545,22 +1026,18 @@ if page == "TPD Draft":
                     if irl_text:
                         p = doc.add_paragraph()
                         p.add_run("\nClient Information Provided:").bold = True
-                        for line in irl_text.splitlines():
-                            if line.strip():
-                                doc.add_paragraph("• " + line.strip())
+                        docx_append_paragraphs(doc, ["• " + line.strip() for line in irl_text.splitlines() if line.strip()])
 
                     # --- Industry Update (mode-aware) ---
-                    doc.add_paragraph()
-                    doc.add_paragraph(f"Industry Update — {industry_choice}")
+                    update_lines: List[str] = ["", f"Industry Update — {industry_choice}"]
 
                     # In Roll-forward mode: add concise “updates only” preface
                     if industry_mode.startswith("Roll-forward"):
-                        doc.add_paragraph("The prior-year narrative is retained. The facts and figures below are refreshed for the current period:")
+                        update_lines.append("The prior-year narrative is retained. The facts and figures below are refreshed for the current period:")
 
                     # Auto lines from credible defaults (World Bank)
                     if auto_lines:
-                        for ln in auto_lines:
-                            doc.add_paragraph(f"- {ln}")
+                        update_lines.extend(f"- {ln}" for ln in auto_lines)
 
                     # User URLs appended (titles + footnotes)
                     foots: List[Tuple[int, str]] = []
@@ -568,27 +1045,29 @@ if page == "TPD Draft":
                         foots.extend(auto_foots)
 
                     if user_url_list:
-                        for u in user_url_list:
-                            title = fetch_title(u)
-                            doc.add_paragraph(f"- See: {title}")
-                            foots.append((len(foots) + 1, u))
+                        titles = fetch_titles(tuple(user_url_list))
+                        base = len(foots)
+                        update_lines.extend(f"- See: {title}" for title in titles)
+                        foots.extend((base + i, u) for i, u in enumerate(user_url_list, 1))
 
                     # Uploaded reports: list them as sources (we’re not parsing content in this open-ended version)
                     if user_reports:
-                        for f in user_reports:
-                            label = getattr(f, "name", "uploaded report")
-                            doc.add_paragraph(f"- See: {label}")
-                            foots.append((len(foots) + 1, f"uploaded://{label}"))
+                        labels = [getattr(f, "name", "uploaded report") for f in user_reports]
+                        base = len(foots)
+                        update_lines.extend(f"- See: {label}" for label in labels)
+                        foots.extend((base + i, f"uploaded://{label}") for i, label in enumerate(labels, 1))
 
                     if foots:
-                        doc.add_paragraph("Sources:")
-                        for i, url in foots:
-                            doc.add_paragraph(f"  ^{i} {url}")
+                        update_lines.append("Sources:")
+                        update_lines.extend(f"  ^{i} {url}" for i, url in foots)
+
+                    docx_append_paragraphs(doc, update_lines)
 
-                    out = io.BytesIO(); doc.save(out); out.seek(0)
+                    out = io.BytesIO()
+                    doc.save(out)
                     st.download_button(
                         "Download Draft (DOCX)",
-                        data=out.getvalue(),
+                        data=out,
                         file_name="TPD_Draft.docx",
                         mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                     )
@@ -596,7 +1075,7 @@ if page == "TPD Draft":
 
             # 5) PDF path (JSON fallback)
             elif is_pdf:
-                text = read_pdf(prior_buffer)
+                text = memo_by_upload(prior, "prior_text", lambda: extract_prior_text(prior.name, prior.getvalue()))
                 payload = {
                     "note": "PDF input: style not preserved. Upload .docx to keep formatting.",
                     "new_fy": int(new_fy),
@@ -608,9 +1087,8 @@ if page == "TPD Draft":
                     "irl": irl_text,
                 }
                 if bench_df is not None and not bench_df.empty:
-                    acc = (bench_df.get("Decision", "").astype(str).str.lower() == "accept").sum()
-                    rej = (bench_df.get("Decision", "").astype(str).str.lower() == "reject").sum()
-                    payload["benchmark_summary"] = f"{acc} accepted, {rej} rejected, {len(bench_df)} total"
+                    acc, rej, total = summarize_benchmark(bench_df)
+                    payload["benchmark_summary"] = f"{acc} accepted, {rej} rejected, {total} total"
                 if user_url_list:
                     payload["user_sources"] = user_url_list
                 if user_reports:
@@ -635,10 +1113,13 @@ elif page == "TNMM Review":
     up = st.file_uploader("Upload Benchmark (CSV/XLSX)", type=["csv", "xlsx"])
     if up:
         try:
-            df = pd.read_csv(up) if up.name.endswith(".csv") else pd.read_excel(up)
+            df = memo_by_upload(up, "tnmm_df", lambda: read_table_bytes(up.name, up.getvalue()))
             st.dataframe(df)
             if "Decision" in df.columns and "Reason" in df.columns:
-                flags = df[(df["Decision"].astype(str).str.lower() == "reject") & (df["Reason"].astype(str).str.strip() == "")]
+                # Nullable "string" dtype: a blank Reason cell (read as NaN) counts as empty, not as "nan"
+                dec = df["Decision"].astype("string").str.lower()
+                rea = df["Reason"].astype("string").fillna("").str.strip()
+                flags = df[dec.eq("reject").fillna(False) & rea.eq("")]
                 st.subheader("⚠️ Rejects with empty reason")
                 st.dataframe(flags)
                 if not flags.empty:
@@ -657,9 +1138,12 @@ elif page == "CUT/CUP Review":
 
 elif page == "Information Request List":
     st.title("Information Request List (IRL)")
-    industry = st.text_input("Industry", value="Technology / Services")
-    transactions = st.text_area("Transactions in-scope (comma-separated)", value="intra-group services, distribution")
-    if st.button("Generate IRL"):
+    # Batch the inputs in a form: editing them doesn't rerun the script until submit
+    with st.form("irl_params"):
+        industry = st.text_input("Industry", value="Technology / Services")
+        transactions = st.text_area("Transactions in-scope (comma-separated)", value="intra-group services, distribution")
+        submitted = st.form_submit_button("Generate IRL")
+    if submitted:
         required = {
             "financials": ["Trial balance FY", "Segmented P&L by service line", "Intercompany charges by counterparty"],
             "legal": ["Latest org chart", "All intercompany agreements", "Board minutes re: restructuring"],
@@ -667,7 +1151,7 @@ elif page == "Information Request List":
         }
         email = (
             f"Dear Client,\n\nTo complete the FY TPD update for {industry}, please provide the following:\n- "
-            + "\n- ".join(sum(required.values(), []))
+            + "\n- ".join(chain.from_iterable(required.values()))
             + "\n\nTransactions in scope: "
             + transactions
             + "\n\nKind regards,\nTP Team"
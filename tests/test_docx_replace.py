@@ -0,0 +1,70 @@
+# Regression tests for the in-place DOCX roll-forward helpers in app.py
+import sys
+from pathlib import Path
+
+import pytest
+
+docx = pytest.importorskip("docx")
+pytest.importorskip("streamlit")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import app  # noqa: E402  (runs the Streamlit script in bare mode: widgets return defaults)
+
+
+def _replace(doc, replacements):
+    return app.docx_replace_text_everywhere(list(app._iter_all_paragraphs(doc)), replacements)
+
+
+def test_tab_stays_in_place():
+    doc = docx.Document()
+    p = doc.add_paragraph("Name:\tFY2023")
+    assert _replace(doc, {"FY2023": "FY2024"}) == 1
+    assert p.text == "Name:\tFY2024"
+
+
+def test_line_breaks_stay_in_place():
+    doc = docx.Document()
+    p = doc.add_paragraph("Year FY2023\nnext line FY2023")
+    assert _replace(doc, {"FY2023": "FY2024"}) == 2
+    assert p.text == "Year FY2024\nnext line FY2024"
+
+
+def test_key_does_not_match_across_a_tab():
+    doc = docx.Document()
+    p = doc.add_paragraph("FY\t2023")
+    assert _replace(doc, {"FY 2023": "FY 2024", "FY2023": "FY2024"}) == 0
+    assert p.text == "FY\t2023"
+
+
+def test_key_split_across_runs_keeps_first_run_formatting():
+    doc = docx.Document()
+    p = doc.add_paragraph()
+    p.add_run("FY ").bold = True
+    p.add_run("2023")
+    assert _replace(doc, {"FY 2023": "FY 2024"}) == 1
+    assert p.text == "FY 2024"
+    assert len(p.runs) == 1 and p.runs[0].bold
+
+
+def test_appended_paragraph_tabs_match_add_paragraph():
+    doc = docx.Document()
+    app.docx_append_paragraphs(doc, ["• Item\tOwner\tDue"])
+    expected = docx.Document().add_paragraph("• Item\tOwner\tDue")
+    appended = doc.paragraphs[-1]
+    assert appended.text == "• Item\tOwner\tDue"
+    assert [c.tag for c in appended._p.r_lst[0]] == [c.tag for c in expected._p.r_lst[0]]
+
+
+def test_walking_paragraphs_does_not_add_header_footer_parts():
+    doc = docx.Document()
+    doc.add_paragraph("FY2023")
+    before = {str(p.partname) for p in doc.part.package.iter_parts()}
+    list(app._iter_all_paragraphs(doc))
+    assert {str(p.partname) for p in doc.part.package.iter_parts()} == before
+
+
+def test_defined_header_is_still_rolled_forward():
+    doc = docx.Document()
+    doc.sections[0].header.paragraphs[0].text = "Transfer Pricing Documentation FY2023"
+    assert _replace(doc, {"FY2023": "FY2024"}) == 1
+    assert doc.sections[0].header.paragraphs[0].text == "Transfer Pricing Documentation FY2024"
@@ -0,0 +1,80 @@
+# Regression tests for fetch_title's streaming cap and retry behaviour (local HTTP server only)
+import http.server
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("streamlit")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import app  # noqa: E402  (runs the Streamlit script in bare mode: widgets return defaults)
+
+STALL = 3.0  # seconds the server waits before sending the rest of the body
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    up = False  # /flaky answers 503 until a test flips this
+
+    def do_GET(self):
+        if self.path.startswith("/flaky"):
+            body = b"<html><head><title>Up now</title></head></html>"
+            self.send_response(200 if _Handler.up else 503)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path.startswith("/unavailable"):
+            self.send_response(503)
+            self.send_header("Retry-After", "4")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        # Title plus more than one 16 KiB read chunk, then a stall before the remaining 8 MB
+        head = b"<html><head><title>Big page</title></head><body>" + b"y" * 32768
+        rest = b"x" * (8 * 1024 * 1024) + b"</body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(head) + len(rest)))
+        self.end_headers()
+        try:
+            self.wfile.write(head)
+            self.wfile.flush()
+            time.sleep(STALL)  # a client that reads the whole body has to wait this out
+            self.wfile.write(rest)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+
+
+def test_title_returns_without_reading_the_whole_body(base_url):
+    start = time.monotonic()
+    assert app.fetch_title(f"{base_url}/big?{start}") == "Big page"
+    assert time.monotonic() - start < STALL
+
+
+def test_user_url_errors_are_not_retried(base_url):
+    url = f"{base_url}/unavailable?{time.monotonic()}"
+    start = time.monotonic()
+    assert app.fetch_title(url) == url
+    assert time.monotonic() - start < 2
+
+
+def test_failed_fetch_is_not_cached(base_url):
+    url = f"{base_url}/flaky?{time.monotonic()}"
+    assert app.fetch_title(url) == url
+    _Handler.up = True
+    assert app.fetch_title(url) == "Up now"
@@ -0,0 +1,20 @@
+# Tests for the upload readers in app.py
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("streamlit")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import app  # noqa: E402  (runs the Streamlit script in bare mode: widgets return defaults)
+
+
+def test_irl_csv_with_blank_cell():
+    text = app.irl_text_from_upload("client.csv", b"a,b\n1,2.5\n3,\n")
+    assert text == "- 1 | 2.5\n- 3 | nan"
+
+
+def test_irl_txt_is_passed_through():
+    assert app.irl_text_from_upload("client.txt", b"- Org chart\n- TP policy\n") == "- Org chart\n- TP policy\n"